@@ -0,0 +1,109 @@
+"""Compare embedding backends against the default PyTorch model.
+
+Reports throughput, single-query latency and how closely the candidate's
+vectors (and the top-k retrieval they produce) agree with the baseline. KB
+contents are the retrieval corpus and email subject + body are the queries,
+mirroring build_knowledge_base and retrieve_relevant_docs.
+
+Usage (from backend/):
+    python -m benchmarks.embedding_benchmark --candidates torch-int8 onnx onnx-int8
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import List
+import numpy as np
+
+from embeddings import create_embedding_backend
+
+DATA_DIR = Path(__file__).resolve().parents[2] / "data"
+
+def load_kb_contents(paths: List[Path]) -> List[str]:
+    return [item["content"] for path in paths for item in json.loads(path.read_text())]
+
+def load_queries(path: Path) -> List[str]:
+    return [f"{email['subject']} {email['body']}" for email in json.loads(path.read_text())]
+
+def percentile_ms(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+def run_backend(name: str, kb_contents: List[str], queries: List[str], batch_size: int, repeat: int):
+    start = time.perf_counter()
+    backend = create_embedding_backend(name)
+    load_s = time.perf_counter() - start
+
+    backend.encode(kb_contents[:batch_size], batch_size=batch_size)  # Warm-up
+
+    # Throughput over the KB repeated, as in build_knowledge_base
+    throughput_texts = kb_contents * repeat
+    start = time.perf_counter()
+    backend.encode(throughput_texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    kb_vectors = backend.encode(kb_contents, batch_size=batch_size)
+
+    latencies = []
+    query_vectors = []
+    for query in queries:
+        start = time.perf_counter()
+        query_vectors.append(backend.encode([query])[0])
+        latencies.append(time.perf_counter() - start)
+
+    stats = {
+        "backend": name,
+        "load_s": round(load_s, 2),
+        "throughput_texts_per_s": round(len(throughput_texts) / elapsed, 1),
+        "latency_p50_ms": round(percentile_ms(latencies, 50), 2),
+        "latency_p95_ms": round(percentile_ms(latencies, 95), 2),
+    }
+    return stats, kb_vectors, np.vstack(query_vectors)
+
+def agreement(baseline: np.ndarray, candidate: np.ndarray) -> dict:
+    cosines = np.sum(baseline * candidate, axis=1)
+    return {
+        "cosine_mean": round(float(cosines.mean()), 4),
+        "cosine_min": round(float(cosines.min()), 4),
+        "cosine_p5": round(float(np.percentile(cosines, 5)), 4),
+    }
+
+def topk_overlap(base_kb, base_queries, cand_kb, cand_queries, top_k: int) -> float:
+    """Mean share of each query's baseline top-k KB items that the candidate also retrieves."""
+    base_top = np.argsort(-(base_queries @ base_kb.T), axis=1)[:, :top_k]
+    cand_top = np.argsort(-(cand_queries @ cand_kb.T), axis=1)[:, :top_k]
+    overlaps = [len(set(b) & set(c)) / top_k for b, c in zip(base_top, cand_top)]
+    return round(float(np.mean(overlaps)), 4)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", default="torch")
+    parser.add_argument("--candidates", nargs="+", default=["torch-int8", "onnx"])
+    parser.add_argument(
+        "--kb", type=Path, nargs="+",
+        default=[DATA_DIR / "seed_knowledge_base.json", DATA_DIR / "seed_knowledge_base_extra.json"],
+        help="KB item files (corpus); defaults to the server's default KB plus extra benchmark items"
+    )
+    parser.add_argument("--emails", type=Path, default=DATA_DIR / "seed_emails.json", help="Emails (queries)")
+    parser.add_argument("--repeat", type=int, default=10, help="Repeat the KB to get stable throughput")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--top-k", type=int, default=3)
+    args = parser.parse_args()
+
+    kb_contents = load_kb_contents(args.kb)
+    queries = load_queries(args.emails)
+
+    base_stats, base_kb, base_queries = run_backend(args.baseline, kb_contents, queries, args.batch_size, args.repeat)
+    results = [base_stats]
+
+    for name in args.candidates:
+        stats, cand_kb, cand_queries = run_backend(name, kb_contents, queries, args.batch_size, args.repeat)
+        stats.update(agreement(np.vstack([base_kb, base_queries]), np.vstack([cand_kb, cand_queries])))
+        stats[f"top{args.top_k}_overlap"] = topk_overlap(
+            base_kb, base_queries, cand_kb, cand_queries, args.top_k
+        )
+        stats["speedup"] = round(stats["throughput_texts_per_s"] / base_stats["throughput_texts_per_s"], 2)
+        results.append(stats)
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
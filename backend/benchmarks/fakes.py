@@ -0,0 +1,263 @@
+"""Offline stand-ins for Gemini, MongoDB and the embedding model.
+
+These let the API be exercised without network access: a deterministic fake
+GenerativeModel with configurable latency, an in-memory Motor-like database
+and a hashing embedding backend.
+"""
+import asyncio
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+import numpy as np
+
+from embeddings import EmbeddingBackend
+
+SENTIMENTS = ["Positive", "Neutral", "Negative"]
+NUMBERED_LINE = re.compile(r"^(\d+)\. (.*)$", re.MULTILINE)
+
+def stable_hash(text: str) -> int:
+    return zlib.crc32(text.encode('utf-8'))
+
+# Fake Gemini model
+class FakeGenerativeModel:
+    """Answers the extraction, sentiment and reply prompts with deterministic JSON.
+
+    `latency_s` is slept in the calling thread (the server calls the model via
+    asyncio.to_thread, like the real SDK); `error_rate` makes calls raise so the
+    fallback paths are exercised, and `truncate_rate` cuts bulk JSON arrays short
+    as if max_output_tokens had been hit.
+
+    Error and truncation decisions are drawn from an RNG seeded by (seed, prompt,
+    how many times that prompt has been seen), not by call order, so runs are
+    reproducible even though concurrent calls arrive in scheduler order.
+    """
+
+    def __init__(self, latency_s: float = 0.0, error_rate: float = 0.0, truncate_rate: float = 0.0, seed: int = 0):
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.seed = seed
+        self.calls = 0
+        self._prompt_counts: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt: str, generation_config=None):
+        prompt_hash = stable_hash(prompt)
+        with self._lock:
+            self.calls += 1
+            occurrence = self._prompt_counts.get(prompt_hash, 0)
+            self._prompt_counts[prompt_hash] = occurrence + 1
+        rng = random.Random(f"{self.seed}:{prompt_hash}:{occurrence}")
+
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if self.error_rate and rng.random() < self.error_rate:
+            raise RuntimeError("Fake LLM error")
+
+        if "extraction assistant" in prompt:
+            text = self._maybe_truncate(rng, json.dumps([
+                {"index": i, **self._extract(body)} for i, body in enumerate(self._numbered(prompt), 1)
+            ]))
+        elif "Analyze the sentiment" in prompt:
+            text = self._maybe_truncate(rng, json.dumps([SENTIMENTS[stable_hash(body) % 3] for body in self._numbered(prompt)]))
+        else:
+            text = json.dumps({
+                "reply_text": "Thank you for contacting us. We have reviewed your request and will follow up shortly.",
+                "sources_used": re.findall(r"id:(\S+)", prompt)[:2],
+                "confidence": 0.8,
+                "suggested_action": "send"
+            })
+
+        text = f"```json\n{text}\n```"
+        usage = SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=len(text) // 4)
+        return SimpleNamespace(text=text, usage_metadata=usage)
+
+    def _maybe_truncate(self, rng: random.Random, text: str) -> str:
+        if self.truncate_rate and rng.random() < self.truncate_rate:
+            return text[:rng.randint(1, len(text) - 1)]
+        return text
+
+    @staticmethod
+    def _numbered(prompt: str) -> List[str]:
+        return [body for _, body in NUMBERED_LINE.findall(prompt.split("Emails:", 1)[-1])]
+
+    @staticmethod
+    def _extract(body: str) -> Dict[str, Any]:
+        order = re.search(r"(?:#|ORD-)(\d+)", body)
+        phone = re.search(r"\+?\d[\d-]{6,}\d", body)
+        return {
+            "phone": phone.group(0) if phone else None,
+            "alt_email": None,
+            "order_id": order.group(1) if order else None,
+            "requested_action": "refund" if "refund" in body.lower() else None,
+            "urgency_keywords": [k for k in ("urgent", "immediately", "asap") if k in body.lower()]
+        }
+
+# Hashing embedding backend: bag of words projected onto seeded random vectors
+class HashingEmbeddingBackend(EmbeddingBackend):
+    name = "hash"
+
+    def __init__(self, model_name: str = "hash", dimension: int = 384):
+        super().__init__(model_name)
+        self._dimension = dimension
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        embeddings = np.zeros((len(texts), self._dimension), dtype='float32')
+        for i, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                embeddings[i] += np.random.default_rng(stable_hash(token)).standard_normal(self._dimension)
+        return embeddings
+
+# In-memory Motor stand-in (only the operations server.py uses)
+def _matches(doc: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, value in query.items():
+        if isinstance(value, dict):
+            raise NotImplementedError(f"Query operators are not supported: {value}")
+        if doc.get(key) != value:
+            return False
+    return True
+
+def _field(doc: Dict[str, Any], expr: Any) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    return expr
+
+class FakeCursor:
+    def __init__(self, docs: List[Dict[str, Any]], latency_s: float):
+        self._docs = docs
+        self._latency_s = latency_s
+
+    def sort(self, field: str, direction: int = 1) -> "FakeCursor":
+        present = [d for d in self._docs if d.get(field) is not None]
+        missing = [d for d in self._docs if d.get(field) is None]
+        present.sort(key=lambda d: d[field], reverse=direction < 0)
+        self._docs = present + missing if direction < 0 else missing + present
+        return self
+
+    def limit(self, n: int) -> "FakeCursor":
+        if n:
+            self._docs = self._docs[:n]
+        return self
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        await asyncio.sleep(self._latency_s)
+        docs = self._docs if length is None else self._docs[:length]
+        return [copy.deepcopy(d) for d in docs]
+
+class FakeCollection:
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.docs: List[Dict[str, Any]] = []
+
+    def find(self, query: Optional[Dict[str, Any]] = None) -> FakeCursor:
+        return FakeCursor([d for d in self.docs if _matches(d, query or {})], self.latency_s)
+
+    async def find_one(self, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        await asyncio.sleep(self.latency_s)
+        for doc in self.docs:
+            if _matches(doc, query):
+                return copy.deepcopy(doc)
+        return None
+
+    async def insert_one(self, doc: Dict[str, Any]):
+        await asyncio.sleep(self.latency_s)
+        doc.setdefault("_id", uuid.uuid4().hex)  # Like pymongo, mutates the caller's dict
+        self.docs.append(copy.deepcopy(doc))
+        return SimpleNamespace(inserted_id=doc["_id"])
+
+    async def insert_many(self, docs: List[Dict[str, Any]]):
+        await asyncio.sleep(self.latency_s)
+        for doc in docs:
+            doc.setdefault("_id", uuid.uuid4().hex)
+            self.docs.append(copy.deepcopy(doc))
+        return SimpleNamespace(inserted_ids=[doc["_id"] for doc in docs])
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any]):
+        await asyncio.sleep(self.latency_s)
+        for doc in self.docs:
+            if _matches(doc, query):
+                for key, value in update.get("$set", {}).items():
+                    doc[key] = copy.deepcopy(value)
+                for key, value in update.get("$push", {}).items():
+                    doc.setdefault(key, []).append(copy.deepcopy(value))
+                return SimpleNamespace(matched_count=1, modified_count=1)
+        return SimpleNamespace(matched_count=0, modified_count=0)
+
+    async def replace_one(self, query: Dict[str, Any], replacement: Dict[str, Any]):
+        await asyncio.sleep(self.latency_s)
+        for i, doc in enumerate(self.docs):
+            if _matches(doc, query):
+                self.docs[i] = {"_id": doc.get("_id"), **copy.deepcopy(replacement)}
+                return SimpleNamespace(matched_count=1, modified_count=1)
+        return SimpleNamespace(matched_count=0, modified_count=0)
+
+    async def delete_one(self, query: Dict[str, Any]):
+        await asyncio.sleep(self.latency_s)
+        for i, doc in enumerate(self.docs):
+            if _matches(doc, query):
+                del self.docs[i]
+                return SimpleNamespace(deleted_count=1)
+        return SimpleNamespace(deleted_count=0)
+
+    async def count_documents(self, query: Dict[str, Any]) -> int:
+        await asyncio.sleep(self.latency_s)
+        return sum(1 for d in self.docs if _matches(d, query))
+
+    def aggregate(self, pipeline: List[Dict[str, Any]]) -> FakeCursor:
+        docs = self.docs
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [d for d in docs if _matches(d, stage["$match"])]
+            elif "$group" in stage:
+                docs = self._group(docs, stage["$group"])
+            else:
+                raise NotImplementedError(f"Unsupported aggregation stage: {stage}")
+        return FakeCursor(docs, self.latency_s)
+
+    @staticmethod
+    def _group(docs: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+        groups: Dict[Any, List[Dict[str, Any]]] = {}
+        for doc in docs:
+            groups.setdefault(_field(doc, spec["_id"]), []).append(doc)
+        results = []
+        for key, members in groups.items():
+            result = {"_id": key}
+            for name, accumulator in spec.items():
+                if name == "_id":
+                    continue
+                op, expr = next(iter(accumulator.items()))
+                values = [_field(d, expr) for d in members]
+                if op == "$sum":
+                    result[name] = sum(v for v in values if isinstance(v, (int, float)))
+                elif op == "$avg":
+                    numbers = [v for v in values if isinstance(v, (int, float))]
+                    result[name] = sum(numbers) / len(numbers) if numbers else None
+                else:
+                    raise NotImplementedError(f"Unsupported accumulator: {op}")
+            results.append(result)
+        return results
+
+class FakeDatabase:
+    """Attribute access returns a collection, like `db.emails` on a Motor database."""
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self._collections: Dict[str, FakeCollection] = {}
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(self.latency_s)
+        return self._collections[name]
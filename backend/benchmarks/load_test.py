@@ -0,0 +1,185 @@
+"""Offline load test for the main API endpoints.
+
+Runs the FastAPI app in-process against a fake Gemini model, an in-memory
+MongoDB stand-in and a hashing embedding backend, seeds synthetic emails and
+KB items at several scales, and reports p50/p95/p99 latency and requests per
+second for each endpoint.
+
+Usage (from backend/):
+    python -m benchmarks.load_test --scales small medium --llm-latency-ms 200
+    python -m benchmarks.load_test --max-p95-ms 250   # non-zero exit on regression
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List
+import numpy as np
+
+import embeddings
+from benchmarks.fakes import FakeDatabase, FakeGenerativeModel, HashingEmbeddingBackend
+
+SCALES = {
+    "tiny": {"emails": 10, "kb_items": 5},  # Smoke tests
+    "small": {"emails": 100, "kb_items": 50},
+    "medium": {"emails": 1000, "kb_items": 500},
+    "large": {"emails": 10000, "kb_items": 5000},
+}
+
+TOPICS = [
+    ("refund", "I would like a refund for order #{order}. The product arrived damaged."),
+    ("shipping", "My order #{order} has not arrived yet. When will it ship?"),
+    ("billing", "I see an unexpected charge on my card for ORD-{order}. Please explain."),
+    ("account", "I cannot log in to my account, the password reset link is broken."),
+    ("feature", "It would be great to export reports as CSV. Is that planned?"),
+    ("technical", "The dashboard is down and shows an error 500. This is urgent, help!"),
+]
+
+def load_server():
+    """Import server.py with offline dependencies in place of Mongo, Gemini and the embedding model."""
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ.setdefault('DB_NAME', 'load_test')
+    os.environ.setdefault('GEMINI_API_KEY', 'offline')
+    os.environ['EMBEDDING_BACKEND'] = 'hash'
+    embeddings.EMBEDDING_BACKENDS['hash'] = HashingEmbeddingBackend
+    import server
+    return server
+
+def synthetic_emails(server, n: int, rng: random.Random) -> List[Dict[str, Any]]:
+    now = datetime.now(timezone.utc)
+    docs = []
+    for i in range(n):
+        topic, template = rng.choice(TOPICS)
+        email = server.Email(
+            sender=f"customer{i}@example.com",
+            sender_name=f"Customer {i}",
+            subject=f"Question about {topic} ({i})",
+            body=template.format(order=rng.randint(10000, 99999)),
+            date_received=now - timedelta(hours=rng.randint(0, 72)),
+            sentiment=rng.choice(["Positive", "Neutral", "Negative"]),
+            priority_score=round(rng.random(), 3),
+            status=rng.choice(["pending", "pending", "resolved"]),
+        )
+        docs.append(email.dict())
+    return docs
+
+def synthetic_kb_items(server, n: int, rng: random.Random) -> List[Dict[str, Any]]:
+    items = []
+    for i in range(n):
+        topic, template = TOPICS[i % len(TOPICS)]
+        item = server.KnowledgeBaseItem(
+            id=f"{topic}_{i:05d}",
+            title=f"{topic.title()} article {i}",
+            content=f"{template.format(order='N')} Answer {i}: see the {topic} policy, section {rng.randint(1, 20)}.",
+            category=topic,
+        )
+        items.append(item.dict())
+    return items
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    ms = np.array(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+async def run_endpoint(client, method: str, paths: List[str], concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(path: str):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(method, path)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(path) for path in paths))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+async def run_scale(server, scale: str, args) -> Dict[str, Any]:
+    import httpx
+
+    rng = random.Random(args.seed)
+    server.db = FakeDatabase(latency_s=args.mongo_latency_ms / 1000)
+    server.model = FakeGenerativeModel(
+        latency_s=args.llm_latency_ms / 1000,
+        error_rate=args.llm_error_rate,
+        truncate_rate=args.llm_truncate_rate,
+        seed=args.seed,
+    )
+    server.query_embedding_cache = server.QueryEmbeddingCache(0 if args.no_cache else 1024)
+
+    sizes = SCALES[scale]
+    emails = synthetic_emails(server, sizes["emails"], rng)
+    server.db.emails.docs.extend(emails)
+    server.db.knowledge_base.docs.extend(synthetic_kb_items(server, sizes["kb_items"], rng))
+    await server.build_knowledge_base()
+
+    email_ids = [e["id"] for e in emails]
+    n = args.requests
+    plan = {
+        "POST /api/emails/ingest/mock": ("POST", ["/api/emails/ingest/mock"] * max(1, n // 10)),
+        "POST /api/emails/{id}/generate": ("POST", [f"/api/emails/{rng.choice(email_ids)}/generate" for _ in range(n)]),
+        "GET /api/emails": ("GET", ["/api/emails?status=all&limit=50"] * n),
+        "GET /api/analytics": ("GET", ["/api/analytics"] * n),
+    }
+
+    results = {}
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+        for endpoint, (method, paths) in plan.items():
+            results[endpoint] = await run_endpoint(client, method, paths, args.concurrency)
+
+    return {"scale": scale, **sizes, "llm_calls": server.model.calls, "endpoints": results}
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per endpoint (ingest runs a tenth)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency-ms", type=float, default=0.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--llm-truncate-rate", type=float, default=0.0, help="Share of bulk LLM responses cut short")
+    parser.add_argument("--mongo-latency-ms", type=float, default=0.0)
+    parser.add_argument("--no-cache", action="store_true", help="Disable the query embedding cache")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if any endpoint's p95 exceeds this")
+    return parser
+
+def main():
+    args = build_parser().parse_args()
+
+    server = load_server()
+
+    async def run_all():
+        return [await run_scale(server, scale, args) for scale in args.scales]
+
+    reports = asyncio.run(run_all())
+    print(json.dumps(reports, indent=2))
+
+    if args.max_p95_ms is not None:
+        slow = [
+            f"{report['scale']} {endpoint}: p95 {stats['p95_ms']}ms"
+            for report in reports
+            for endpoint, stats in report["endpoints"].items()
+            if stats["p95_ms"] > args.max_p95_ms
+        ]
+        if slow:
+            print("p95 budget exceeded:\n  " + "\n  ".join(slow), file=sys.stderr)
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import os
+import logging
+from collections import OrderedDict
+from typing import List, Optional
+import numpy as np
+
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+DEFAULT_ONNX_FILE = 'onnx/model_qint8_avx512_vnni.onnx'
+
+# Embedding backend interface
+class EmbeddingBackend:
+    """Turns a list of texts into L2-normalized float32 vectors."""
+    name = "base"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        self.model_name = model_name
+
+    @property
+    def dimension(self) -> int:
+        raise NotImplementedError
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        embeddings = np.asarray(self._encode(texts, batch_size), dtype='float32')
+        if embeddings.ndim == 1:
+            embeddings = embeddings.reshape(1, -1)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return embeddings / norms
+
+# Default PyTorch backend (original behaviour)
+class SentenceTransformerBackend(EmbeddingBackend):
+    name = "torch"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, **model_kwargs):
+        super().__init__(model_name)
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu", **model_kwargs)
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _encode(self, texts: List[str], batch_size: int) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+# Int8 dynamic quantization of the PyTorch Linear layers
+class QuantizedTorchBackend(SentenceTransformerBackend):
+    name = "torch-int8"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        super().__init__(model_name)
+        import torch
+        self.model = torch.quantization.quantize_dynamic(
+            self.model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+
+# ONNX Runtime backend (EMBEDDING_ONNX_FILE selects a specific graph)
+class OnnxBackend(SentenceTransformerBackend):
+    name = "onnx"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME, file_name: Optional[str] = None):
+        file_name = file_name or os.environ.get('EMBEDDING_ONNX_FILE')
+        model_kwargs = {"file_name": file_name} if file_name else {}
+        try:
+            super().__init__(model_name, backend="onnx", model_kwargs=model_kwargs)
+        except (ImportError, TypeError) as e:
+            # TypeError: sentence-transformers < 3.2 has no `backend` argument
+            raise ImportError(
+                "The ONNX embedding backend needs sentence-transformers>=3.2 and optimum[onnxruntime] "
+                "(pip install \"sentence-transformers>=3.2\" \"optimum[onnxruntime]\")"
+            ) from e
+        self.file_name = file_name
+
+# ONNX Runtime with the pre-quantized int8 graph shipped with the model
+class OnnxInt8Backend(OnnxBackend):
+    name = "onnx-int8"
+
+    def __init__(self, model_name: str = DEFAULT_MODEL_NAME):
+        super().__init__(model_name, file_name=os.environ.get('EMBEDDING_ONNX_FILE', DEFAULT_ONNX_FILE))
+
+# LRU cache of single-query embeddings (e.g. regenerating a reply for the same email)
+class QueryEmbeddingCache:
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        embedding = self._entries.get(text)
+        if embedding is not None:
+            self._entries.move_to_end(text)
+        return embedding
+
+    def put(self, text: str, embedding: np.ndarray) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[text] = embedding
+        self._entries.move_to_end(text)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+EMBEDDING_BACKENDS = {
+    "torch": SentenceTransformerBackend,
+    "torch-int8": QuantizedTorchBackend,
+    "onnx": OnnxBackend,
+    "onnx-int8": OnnxInt8Backend,
+}
+
+def create_embedding_backend(name: Optional[str] = None, model_name: Optional[str] = None) -> EmbeddingBackend:
+    """Build the backend selected by EMBEDDING_BACKEND (any key of EMBEDDING_BACKENDS)."""
+    name = (name or os.environ.get('EMBEDDING_BACKEND', 'torch')).lower()
+    model_name = model_name or os.environ.get('EMBEDDING_MODEL', DEFAULT_MODEL_NAME)
+
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {', '.join(EMBEDDING_BACKENDS)}")
+    backend = EMBEDDING_BACKENDS[name](model_name)
+    backend.name = name
+
+    logging.info(f"Embedding backend '{name}' loaded for {model_name}")
+    return backend
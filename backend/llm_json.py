@@ -0,0 +1,165 @@
+import json
+import logging
+import re
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from metrics import record_bulk_items, record_llm_fallback
+
+_decoder = json.JSONDecoder()
+_FENCE_START = re.compile(r"^```[a-zA-Z]*\s*")
+_WRAPPED_ARRAY = re.compile(r'^\{\s*"[^"\\]*"\s*:\s*\[')
+_WHITESPACE = " \t\n\r"
+
+def strip_code_fences(text: str) -> str:
+    """Remove a leading ```/```json fence and a trailing ``` fence."""
+    text = _FENCE_START.sub("", text.strip())
+    if text.endswith("```"):
+        text = text[:-3]
+    return text.strip()
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in _WHITESPACE:
+        pos += 1
+    return pos
+
+def _element_end(text: str, pos: int) -> int:
+    """Index of the ',' or ']' that ends the array element starting at pos (len(text) if truncated)."""
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(pos, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in "[{":
+            depth += 1
+        elif char == "]" and depth == 0:
+            return i
+        elif char in "]}":
+            depth = max(depth - 1, 0)  # A stray '}' at depth 0 is garbage, not a separator
+        elif char == "," and depth == 0:
+            return i
+    return len(text)
+
+def _array_start(text: str) -> int:
+    """Position of the bulk array's '[' (bare or wrapped as {"key": [...]}), or -1."""
+    if text.startswith("{"):
+        match = _WRAPPED_ARRAY.match(text)
+        return match.end() - 1 if match else -1
+    return text.find("[")
+
+def parse_json_array_partial(text: str, expected: Optional[int] = None) -> Tuple[List[Any], bool]:
+    """Parse a JSON array element by element, keeping every element that decodes.
+
+    Malformed elements become None in their slot so later elements keep their
+    index; elements lost to truncation are padded with None up to `expected`.
+    Anything after a value other than a separator (a stray quote, a missing
+    comma) makes the position of later elements ambiguous, so parsing stops
+    there and the remaining slots stay missing rather than risk shifting items
+    onto the wrong emails. An object whose only key holds the array is
+    unwrapped, and a bare object is taken as the single item when expected == 1.
+    Returns (items, complete), where complete means the whole array was valid.
+    """
+    text = text.strip()
+    items: List[Any] = []
+    complete = False
+    try:
+        parsed = json.loads(text)
+        if isinstance(parsed, dict):
+            if len(parsed) == 1 and isinstance(next(iter(parsed.values())), list):
+                parsed = next(iter(parsed.values()))
+            elif expected == 1:
+                parsed = [parsed]
+        if isinstance(parsed, list):
+            items, complete = parsed, True
+    except json.JSONDecodeError:
+        pass
+
+    start = _array_start(text)
+    if not complete and start >= 0:
+        pos = start + 1
+        while True:
+            pos = _skip_whitespace(text, pos)
+            if pos >= len(text) or text[pos] == "]":
+                break
+            try:
+                value, end = _decoder.raw_decode(text, pos)
+            except json.JSONDecodeError:
+                # Malformed or truncated element: keep its slot empty and resync on the next separator
+                items.append(None)
+                end = _element_end(text, pos)
+                if end >= len(text) or text[end] == "]":
+                    break
+                pos = end + 1
+                continue
+
+            items.append(value)
+            end = _skip_whitespace(text, end)
+            while end < len(text) and text[end] == "}":
+                end = _skip_whitespace(text, end + 1)  # Stray closing brace
+            if end >= len(text) or text[end] != ",":
+                break  # End of array, truncation, or an ambiguous token
+            pos = end + 1
+
+    if expected is not None:
+        items = (items + [None] * expected)[:expected]
+    return items, complete
+
+def match_items_by_index(items: List[Any], expected: int) -> List[Any]:
+    """Re-slot objects by their 1-based "index" field when every object carries a valid one."""
+    objects = [item for item in items if item is not None]
+    indexes = [item.get("index") if isinstance(item, dict) else None for item in objects]
+    if not objects or not all(isinstance(i, int) and 1 <= i <= expected for i in indexes):
+        return items
+    slots: List[Any] = [None] * expected
+    for index, item in zip(indexes, objects):
+        if slots[index - 1] is None:  # First answer for an index wins
+            slots[index - 1] = item
+    return slots
+
+# Recover every valid element of a bulk JSON array, keeping each in its email's slot
+def parse_bulk_items(operation: str, attempt: str, result_text: str, expected: int,
+                     validate: Callable[[Any], Any]) -> List[Optional[Any]]:
+    items, complete = parse_json_array_partial(strip_code_fences(result_text), expected)
+    items = match_items_by_index(items, expected)
+    results = []
+    for item in items:
+        try:
+            results.append(validate(item) if item is not None else None)
+        except (TypeError, ValueError):
+            results.append(None)
+    valid = sum(result is not None for result in results)
+    record_bulk_items(operation, attempt, valid, complete, expected - valid)
+    return results
+
+# Run a bulk LLM helper, then re-queue only the missing/invalid items in a smaller follow-up batch.
+# run_batch returns None when the call itself failed (timeout, quota); that is not
+# retried, since re-sending the batch would just double calls during an outage.
+async def run_bulk_with_followup(operation: str, emails: List[str],
+                                 run_batch: Callable[[List[str], str], Awaitable[Optional[List[Optional[Any]]]]],
+                                 fallback: Callable[[], Any], max_followups: int = 1) -> List[Any]:
+    results = await run_batch(emails, "initial")
+    if results is None:
+        results = [None] * len(emails)
+    else:
+        for _ in range(max_followups):
+            missing = [i for i, result in enumerate(results) if result is None]
+            if not missing:
+                break
+            logging.warning(f"Re-queuing {len(missing)}/{len(emails)} {operation} items")
+            retried = await run_batch([emails[i] for i in missing], "followup")
+            if retried is None:
+                break
+            for i, result in zip(missing, retried):
+                results[i] = result
+
+    if any(result is None for result in results):
+        record_llm_fallback(operation)
+    return [result if result is not None else fallback() for result in results]
@@ -0,0 +1,77 @@
+import os
+import time
+from prometheus_client import (
+    CollectorRegistry, Counter, Histogram, CONTENT_TYPE_LATEST, generate_latest, multiprocess
+)
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import Response
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Pipeline stages: embedding, vector_search, prompt_build, llm_call, json_parse, mongo_read, mongo_write
+STAGE_LATENCY = Histogram(
+    'sca_stage_duration_seconds', 'Latency of individual pipeline stages',
+    ['stage', 'operation'], buckets=LATENCY_BUCKETS
+)
+REQUEST_LATENCY = Histogram(
+    'sca_http_request_duration_seconds', 'HTTP request latency',
+    ['method', 'route', 'status'], buckets=LATENCY_BUCKETS
+)
+LLM_FALLBACKS = Counter(
+    'sca_llm_fallbacks_total', 'LLM calls that failed and returned default data', ['operation']
+)
+LLM_TOKENS = Counter(
+    'sca_llm_tokens_total', 'Tokens reported by Gemini usage metadata', ['operation', 'kind']
+)
+LLM_BULK_ITEMS = Counter(
+    'sca_llm_bulk_items_total', 'Items in bulk LLM responses by parse outcome',
+    ['operation', 'attempt', 'outcome']
+)
+CACHE_REQUESTS = Counter(
+    'sca_cache_requests_total', 'Cache lookups', ['cache', 'result']
+)
+
+def time_stage(stage: str, operation: str):
+    """Context manager that records the wall time of a block, including awaits."""
+    return STAGE_LATENCY.labels(stage, operation).time()
+
+def record_llm_usage(operation: str, response) -> None:
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is None:
+        return
+    LLM_TOKENS.labels(operation, 'prompt').inc(getattr(usage, 'prompt_token_count', 0) or 0)
+    LLM_TOKENS.labels(operation, 'completion').inc(getattr(usage, 'candidates_token_count', 0) or 0)
+
+def record_llm_fallback(operation: str) -> None:
+    LLM_FALLBACKS.labels(operation).inc()
+
+def record_bulk_items(operation: str, attempt: str, valid: int, complete: bool, missing: int) -> None:
+    """Count valid items as 'parsed' (whole response valid) or 'recovered' (salvaged from a broken one)."""
+    LLM_BULK_ITEMS.labels(operation, attempt, 'parsed' if complete else 'recovered').inc(valid)
+    LLM_BULK_ITEMS.labels(operation, attempt, 'missing').inc(missing)
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+def metrics_response() -> Response:
+    """Render metrics, aggregating across workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+# Request-level timing, labelled by route template to keep label cardinality bounded
+class RequestTimingMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            route = request.scope.get('route')
+            route_path = getattr(route, 'path', 'unmatched')
+            REQUEST_LATENCY.labels(request.method, route_path, str(status)).observe(time.perf_counter() - start)
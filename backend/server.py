@@ -12,11 +12,15 @@ from datetime import datetime, timezone
 import json
 import asyncio
 import google.generativeai as genai
-import numpy as np
-from sentence_transformers import SentenceTransformer
-import faiss
 import re
 import uvicorn
+from embeddings import create_embedding_backend, QueryEmbeddingCache
+from vector_store import KnowledgeBaseStore, load_index_config, process_rss_bytes
+from metrics import (
+    RequestTimingMiddleware, metrics_response, record_bulk_items, record_cache, record_llm_fallback,
+    record_llm_usage, time_stage
+)
+from llm_json import parse_bulk_items, run_bulk_with_followup, strip_code_fences
 
 # Knowledge Base Model
 class KnowledgeBaseItem(BaseModel):
@@ -36,6 +40,7 @@ class SentReply(BaseModel):
     sent_by: str = "user"
 
 ROOT_DIR = Path(__file__).parent
+DEFAULT_KB_FILE = ROOT_DIR.parent / 'data' / 'seed_knowledge_base.json'  # Seeded when the KB collection is empty
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
@@ -47,88 +52,29 @@ db = client[os.environ['DB_NAME']]
 genai.configure(api_key=os.environ['GEMINI_API_KEY'])
 model = genai.GenerativeModel('gemini-2.0-flash-exp')
 
-# Initialize embedding model and FAISS
-embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
-vector_dimension = 384  # all-MiniLM-L6-v2 dimension
-faiss_index = faiss.IndexFlatIP(vector_dimension)  # Inner product for cosine similarity
+# Initialize embedding backend (EMBEDDING_BACKEND=torch|torch-int8|onnx|onnx-int8) and FAISS
+embedding_model = create_embedding_backend()
+vector_dimension = embedding_model.dimension  # 384 for all-MiniLM-L6-v2
+query_embedding_cache = QueryEmbeddingCache(int(os.environ.get('EMBEDDING_CACHE_SIZE', 1024)))
 
-# Knowledge base documents - will be loaded from database
-knowledge_base = []
+# Knowledge base retrieval store (VECTOR_INDEX=flat|sq8|pq) - will be loaded from database.
+# The index config is validated here so a bad value stops startup instead of yielding an empty store.
+vector_index_config = load_index_config(vector_dimension)
+kb_store = KnowledgeBaseStore.empty(vector_dimension)
 
 # Build FAISS index from database
 async def build_knowledge_base():
-    global faiss_index, knowledge_base
+    global kb_store
     try:
         # Fetch knowledge base items from database
         kb_items = await db.knowledge_base.find({}).to_list(length=None)
         
         if not kb_items:
             # Initialize with default knowledge base if empty
+            now = datetime.now(timezone.utc)
             default_kb = [
-                {
-                    "id": "faq_01",
-                    "title": "Refund Policy",
-                    "content": "We offer full refunds within 30 days of purchase. To request a refund, contact support with your order ID.",
-                    "category": "policy",
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                },
-                {
-                    "id": "faq_02",
-                    "title": "Shipping Information", 
-                    "content": "Standard shipping takes 3-5 business days. Express shipping is available for 1-2 day delivery.",
-                    "category": "shipping",
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                },
-                {
-                    "id": "faq_03",
-                    "title": "Account Issues",
-                    "content": "If you're having trouble accessing your account, try resetting your password or contact support.",
-                    "category": "account",
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                },
-                {
-                    "id": "policy_01",
-                    "title": "Privacy Policy",
-                    "content": "We protect your personal information and only use it to provide our services. We never share data with third parties.",
-                    "category": "policy",
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                },
-                {
-                    "id": "policy_02",
-                    "title": "Terms of Service",
-                    "content": "By using our service, you agree to our terms. Violations may result in account suspension.",
-                    "category": "policy",
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                },
-                {
-                    "id": "billing_01",
-                    "title": "Billing Support",
-                    "content": "For billing questions, contact our billing team with your order ID and payment method details.",
-                    "category": "billing",
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                },
-                {
-                    "id": "tech_01",
-                    "title": "Technical Support",
-                    "content": "For technical issues, please provide your device information, browser version, and steps to reproduce the issue.",
-                    "category": "technical",
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                },
-                {
-                    "id": "feature_01",
-                    "title": "Feature Requests",
-                    "content": "We welcome feature suggestions! Please describe your use case and how it would benefit other users.",
-                    "category": "feature",
-                    "created_at": datetime.now(timezone.utc),
-                    "updated_at": datetime.now(timezone.utc)
-                }
+                {**item, "created_at": now, "updated_at": now}
+                for item in json.loads(DEFAULT_KB_FILE.read_text())
             ]
             
             # Insert default knowledge base
@@ -140,27 +86,24 @@ async def build_knowledge_base():
             if "_id" in item:
                 del item["_id"]
         
-        knowledge_base = kb_items
-        
-        if knowledge_base:
-            # Build new FAISS index
-            texts = [doc["content"] for doc in knowledge_base]
-            embeddings = embedding_model.encode(texts)
-            embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)  # Normalize
+        if kb_items:
+            # Build new FAISS index; only id, title and snippet are kept in memory
+            texts = [doc["content"] for doc in kb_items]
+            with time_stage("embedding", "kb_build"):
+                embeddings = embedding_model.encode(texts)  # Normalized by the backend
             
-            # Reset index
-            faiss_index = faiss.IndexFlatIP(vector_dimension)
-            faiss_index.add(embeddings.astype('float32'))
+            with time_stage("index_build", "kb_build"):
+                kb_store = KnowledgeBaseStore(kb_items, embeddings, vector_dimension, **vector_index_config)
             
-            logging.info(f"Knowledge base rebuilt with {len(knowledge_base)} items")
+            logging.info(f"Knowledge base rebuilt with {len(kb_store)} items ({kb_store.index_type} index)")
         else:
+            kb_store = KnowledgeBaseStore.empty(vector_dimension)
             logging.warning("Knowledge base is empty")
             
     except Exception as e:
         logging.error(f"Error building knowledge base: {e}")
         # Fallback to empty knowledge base
-        knowledge_base = []
-        faiss_index = faiss.IndexFlatIP(vector_dimension)
+        kb_store = KnowledgeBaseStore.empty(vector_dimension)
 
 # Create the main app
 app = FastAPI()
@@ -272,105 +215,128 @@ def compute_priority_score(email_dict, vip_list=set()):
     
     return round(score, 3), rationale
 
+# Sentiment label validation
+SENTIMENT_LABELS = ("Positive", "Neutral", "Negative")
+
+def validate_sentiment(value: Any) -> str:
+    label = str(value).strip().capitalize()
+    if label not in SENTIMENT_LABELS:
+        raise ValueError(f"Invalid sentiment: {value}")
+    return label
+
 # Email extraction using Gemini
-async def extract_email_info_bulk(emails: List[str]) -> List[ExtractedData]:
+async def extract_email_info_batch(emails: List[str], attempt: str = "initial") -> Optional[List[Optional[ExtractedData]]]:
     try:
-        # Build a single prompt with numbered emails
-        numbered_emails = "\n".join([f"{i+1}. {e}" for i, e in enumerate(emails)])
-        extraction_prompt = f"""
+        with time_stage("prompt_build", "extract"):
+            # Build a single prompt with numbered emails
+            numbered_emails = "\n".join([f"{i+1}. {e}" for i, e in enumerate(emails)])
+            extraction_prompt = f"""
 SYSTEM: You are an extraction assistant. ONLY output valid JSON.
 
 USER: Extract for each email the following fields: phone, alt_email, requested_action, order_id, urgency_keywords.
-Return a JSON array with one object per email, preserving order.
+Return a JSON array with one object per email, preserving order. Include "index" with the email's number in each object.
 Emails:
 {numbered_emails}
 """
 
-        response = await asyncio.to_thread(
-            model.generate_content,
-            extraction_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.0,
-                max_output_tokens=2048
+        with time_stage("llm_call", "extract"):
+            response = await asyncio.to_thread(
+                model.generate_content,
+                extraction_prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.0,
+                    max_output_tokens=2048
+                )
             )
-        )
-
-        result_text = response.text.strip()
-        if result_text.startswith('```json'):
-            result_text = result_text[7:]
-        if result_text.endswith('```'):
-            result_text = result_text[:-3]
+        record_llm_usage("extract", response)
 
-        data = json.loads(result_text)
-        return [ExtractedData(**item) for item in data]
+        with time_stage("json_parse", "extract"):
+            return parse_bulk_items(
+                "extract", attempt, response.text, len(emails), lambda item: ExtractedData(**item)
+            )
 
     except Exception as e:
         logging.error(f"Bulk extraction failed: {e}")
-        return [ExtractedData() for _ in emails]  # fallback empty results
+        record_bulk_items("extract", attempt, 0, False, len(emails))
+        return None  # Call failed: no follow-up
+
+async def extract_email_info_bulk(emails: List[str]) -> List[ExtractedData]:
+    return await run_bulk_with_followup(
+        "extract", emails, extract_email_info_batch, ExtractedData  # fallback empty results
+    )
 
 
 # Sentiment analysis using Gemini
-async def analyze_sentiment_bulk(emails: List[str]) -> List[str]:
+async def analyze_sentiment_batch(emails: List[str], attempt: str = "initial") -> Optional[List[Optional[str]]]:
     try:
-        numbered_emails = "\n".join([f"{i+1}. {e}" for i, e in enumerate(emails)])
-        sentiment_prompt = f"""
+        with time_stage("prompt_build", "sentiment"):
+            numbered_emails = "\n".join([f"{i+1}. {e}" for i, e in enumerate(emails)])
+            sentiment_prompt = f"""
 Analyze the sentiment for each of these emails. Respond with a JSON list containing only one of these values for each email: "Positive", "Neutral", or "Negative".
 Emails:
 {numbered_emails}
 """
 
-        response = await asyncio.to_thread(
-            model.generate_content,
-            sentiment_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.0,
-                max_output_tokens=512
+        with time_stage("llm_call", "sentiment"):
+            response = await asyncio.to_thread(
+                model.generate_content,
+                sentiment_prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.0,
+                    max_output_tokens=512
+                )
             )
-        )
+        record_llm_usage("sentiment", response)
 
-        result_text = response.text.strip()
-        if result_text.startswith('```json'):
-            result_text = result_text[7:]
-        if result_text.endswith('```'):
-            result_text = result_text[:-3]
-
-        return json.loads(result_text)
+        with time_stage("json_parse", "sentiment"):
+            return parse_bulk_items("sentiment", attempt, response.text, len(emails), validate_sentiment)
 
     except Exception as e:
         logging.error(f"Bulk sentiment analysis failed: {e}")
-        return ["Neutral"] * len(emails)  # fallback neutral
+        record_bulk_items("sentiment", attempt, 0, False, len(emails))
+        return None  # Call failed: no follow-up
+
+async def analyze_sentiment_bulk(emails: List[str]) -> List[str]:
+    return await run_bulk_with_followup(
+        "sentiment", emails, analyze_sentiment_batch, lambda: "Neutral"  # fallback neutral
+    )
 
 # RAG retrieval
 def retrieve_relevant_docs(query: str, top_k: int = 3) -> List[RetrievalHit]:
-    if not knowledge_base or faiss_index.ntotal == 0:
+    store = kb_store
+    if len(store) == 0:
         return []
         
-    query_embedding = embedding_model.encode([query])
-    query_embedding = query_embedding / np.linalg.norm(query_embedding, axis=1, keepdims=True)
+    query_embedding = query_embedding_cache.get(query)
+    record_cache("query_embedding", query_embedding is not None)
+    if query_embedding is None:
+        with time_stage("embedding", "retrieve"):
+            query_embedding = embedding_model.encode([query])
+        query_embedding_cache.put(query, query_embedding)
     
-    scores, indices = faiss_index.search(query_embedding.astype('float32'), top_k)
+    with time_stage("vector_search", "retrieve"):
+        results = store.search(query_embedding, top_k)
     
     hits = []
-    for score, idx in zip(scores[0], indices[0]):
-        if idx < len(knowledge_base) and idx >= 0:
-            doc = knowledge_base[idx]
-            hits.append(RetrievalHit(
-                doc_id=doc["id"],
-                title=doc["title"],
-                snippet=doc["content"][:150] + "..." if len(doc["content"]) > 150 else doc["content"],
-                score=float(score)
-            ))
+    for idx, score in results:
+        hits.append(RetrievalHit(
+            doc_id=store.ids[idx],
+            title=store.titles[idx],
+            snippet=store.snippets[idx],
+            score=score
+        ))
     
     return hits
 
 # Generate reply using RAG + Gemini
 async def generate_reply(email: Dict[str, Any], retrieval_hits: List[RetrievalHit]) -> DraftReply:
     try:
-        context_docs = ""
-        for i, hit in enumerate(retrieval_hits, 1):
-            context_docs += f"{i}) id:{hit.doc_id} score:{hit.score:.2f} snippet:\"{hit.snippet}\"\n"
-        
-        reply_prompt = f"""SYSTEM: You are the professional ACME Support Assistant. Use only the CONTEXT DOCUMENTS for factual claims. Return JSON only:
+        with time_stage("prompt_build", "reply"):
+            context_docs = ""
+            for i, hit in enumerate(retrieval_hits, 1):
+                context_docs += f"{i}) id:{hit.doc_id} score:{hit.score:.2f} snippet:\"{hit.snippet}\"\n"
+            
+            reply_prompt = f"""SYSTEM: You are the professional ACME Support Assistant. Use only the CONTEXT DOCUMENTS for factual claims. Return JSON only:
 {{
   "reply_text":"", "sources_used":[], "confidence":0.0, "suggested_action":"send|edit|escalate"
 }}
@@ -389,22 +355,19 @@ METADATA:
 
 TASK: Generate a concise, professional reply (<= 180 words). If info missing, ask one clarifying question. If sentiment is Negative, include an empathetic line. Populate sources_used with doc ids used for facts."""
 
-        response = await asyncio.to_thread(
-            model.generate_content,
-            reply_prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.0,
-                max_output_tokens=512
+        with time_stage("llm_call", "reply"):
+            response = await asyncio.to_thread(
+                model.generate_content,
+                reply_prompt,
+                generation_config=genai.types.GenerationConfig(
+                    temperature=0.0,
+                    max_output_tokens=512
+                )
             )
-        )
-        
-        result_text = response.text.strip()
-        if result_text.startswith('```json'):
-            result_text = result_text[7:]
-        if result_text.endswith('```'):
-            result_text = result_text[:-3]
+        record_llm_usage("reply", response)
         
-        reply_data = json.loads(result_text)
+        with time_stage("json_parse", "reply"):
+            reply_data = json.loads(strip_code_fences(response.text))
         
         return DraftReply(
             text=reply_data.get("reply_text", "Thank you for contacting us. We'll review your inquiry and respond soon."),
@@ -414,6 +377,7 @@ TASK: Generate a concise, professional reply (<= 180 words). If info missing, as
     
     except Exception as e:
         logging.error(f"Reply generation failed: {e}")
+        record_llm_fallback("reply")
         sentiment_response = ""
         if email['sentiment'] == "Negative":
             sentiment_response = "I understand your frustration, and I sincerely apologize for any inconvenience. "
@@ -493,7 +457,8 @@ async def ingest_mock_emails():
             priority_rationale=rationale
         )
 
-        await db.emails.insert_one(email.dict())
+        with time_stage("mongo_write", "ingest"):
+            await db.emails.insert_one(email.dict())
         ingested_count += 1
 
     return {"ingested": ingested_count}
@@ -555,7 +520,8 @@ async def get_email_detail(email_id: str):
 
 @api_router.post("/emails/{email_id}/generate")
 async def generate_email_reply(email_id: str):
-    email = await db.emails.find_one({"id": email_id})
+    with time_stage("mongo_read", "generate"):
+        email = await db.emails.find_one({"id": email_id})
     if not email:
         raise HTTPException(status_code=404, detail="Email not found")
     
@@ -567,16 +533,17 @@ async def generate_email_reply(email_id: str):
     draft_reply = await generate_reply(email, retrieval_hits)
     
     # Update email with retrieval hits and draft reply
-    await db.emails.update_one(
-        {"id": email_id},
-        {
-            "$set": {
-                "retrieval_hits": [hit.dict() for hit in retrieval_hits],
-                "draft_reply": draft_reply.dict(),
-                "updated_at": datetime.now(timezone.utc)
+    with time_stage("mongo_write", "generate"):
+        await db.emails.update_one(
+            {"id": email_id},
+            {
+                "$set": {
+                    "retrieval_hits": [hit.dict() for hit in retrieval_hits],
+                    "draft_reply": draft_reply.dict(),
+                    "updated_at": datetime.now(timezone.utc)
+                }
             }
-        }
-    )
+        )
     
     # Add audit log
     audit_entry = AuditLogEntry(
@@ -585,10 +552,11 @@ async def generate_email_reply(email_id: str):
         text=draft_reply.text
     )
     
-    await db.emails.update_one(
-        {"id": email_id},
-        {"$push": {"audit_log": audit_entry.dict()}}
-    )
+    with time_stage("mongo_write", "generate"):
+        await db.emails.update_one(
+            {"id": email_id},
+            {"$push": {"audit_log": audit_entry.dict()}}
+        )
     
     return {
         "draft_reply": draft_reply.dict(),
@@ -729,15 +697,27 @@ async def rebuild_knowledge_base():
         await build_knowledge_base()
         return {
             "status": "success", 
-            "message": f"Knowledge base rebuilt with {len(knowledge_base)} items",
-            "total_items": len(knowledge_base)
+            "message": f"Knowledge base rebuilt with {len(kb_store)} items",
+            "total_items": len(kb_store)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to rebuild knowledge base: {str(e)}")
 
+# Memory footprint of the retrieval store in this worker
+@api_router.get("/knowledge-base/memory")
+async def get_knowledge_base_memory():
+    return {**kb_store.memory_usage(), "process_rss_bytes": process_rss_bytes()}
+
+# Prometheus metrics
+@app.get("/metrics")
+async def get_metrics():
+    return metrics_response()
+
 # Include router
 app.include_router(api_router)
 
+app.add_middleware(RequestTimingMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
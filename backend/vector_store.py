@@ -0,0 +1,134 @@
+import os
+import logging
+import tempfile
+from typing import Any, Dict, List, Tuple
+import numpy as np
+import faiss
+
+SNIPPET_LENGTH = 150
+
+# Column of strings packed into one UTF-8 buffer plus an offsets array
+class StringColumn:
+    def __init__(self, values: List[str]):
+        encoded = [value.encode('utf-8') for value in values]
+        self.offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(value) for value in encoded], out=self.offsets[1:])
+        self.data = b"".join(encoded)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode('utf-8')
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.data) + self.offsets.nbytes
+
+def make_snippet(content: str) -> str:
+    return content[:SNIPPET_LENGTH] + "..." if len(content) > SNIPPET_LENGTH else content
+
+INDEX_TYPES = ("flat", "sq8", "pq")
+
+def load_index_config(dimension: int) -> Dict[str, Any]:
+    """Read and validate VECTOR_INDEX (flat|sq8|pq), VECTOR_PQ_M and VECTOR_RERANK_FACTOR."""
+    index_type = os.environ.get('VECTOR_INDEX', 'flat').lower()
+    pq_m = int(os.environ.get('VECTOR_PQ_M', 48))
+    rerank_factor = int(os.environ.get('VECTOR_RERANK_FACTOR', 4))
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown VECTOR_INDEX '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+    if pq_m <= 0 or dimension % pq_m != 0:
+        raise ValueError(f"VECTOR_PQ_M={pq_m} must divide the vector dimension {dimension}")
+    if rerank_factor < 1:
+        raise ValueError(f"VECTOR_RERANK_FACTOR must be at least 1, got {rerank_factor}")
+    return {"index_type": index_type, "pq_m": pq_m, "rerank_factor": rerank_factor}
+
+def build_index(embeddings: np.ndarray, index_type: str, pq_m: int = 48) -> faiss.Index:
+    """Build a flat, SQ8 or PQ inner-product index over normalized embeddings."""
+    n, dimension = embeddings.shape
+    if index_type == "sq8" and n > 0:
+        index = faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    elif index_type == "pq" and n > 1:
+        if dimension % pq_m != 0:
+            raise ValueError(f"VECTOR_PQ_M={pq_m} must divide the vector dimension {dimension}")
+        # PQ training needs at least 2**nbits points, so shrink codebooks for small KBs
+        nbits = int(min(8, np.floor(np.log2(n))))
+        index = faiss.IndexPQ(dimension, pq_m, nbits, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    elif index_type in INDEX_TYPES:
+        index = faiss.IndexFlatIP(dimension)
+    else:
+        raise ValueError(f"Unknown vector index type: {index_type}")
+    index.add(embeddings)
+    return index
+
+# Knowledge base retrieval store: compressed vectors + compact metadata columns.
+# Full document content stays in MongoDB and is only read by the CRUD endpoints.
+class KnowledgeBaseStore:
+    def __init__(self, docs: List[Dict[str, Any]], embeddings: np.ndarray, dimension: int,
+                 index_type: str = "flat", pq_m: int = 48, rerank_factor: int = 4):
+        self.index_type = index_type
+        self.rerank_factor = rerank_factor
+        self.ids = StringColumn([doc["id"] for doc in docs])
+        self.titles = StringColumn([doc["title"] for doc in docs])
+        self.snippets = StringColumn([make_snippet(doc["content"]) for doc in docs])
+
+        embeddings = np.ascontiguousarray(embeddings, dtype='float32').reshape(-1, dimension)
+        self.index = build_index(embeddings, index_type, pq_m)
+
+        # Exact vectors for re-ranking live in an unlinked temp file, so only the
+        # pages of the candidates being re-scored are pulled into memory.
+        self.rerank_vectors = None
+        if not isinstance(self.index, faiss.IndexFlat) and len(embeddings):
+            self._rerank_file = tempfile.TemporaryFile(dir=os.environ.get('VECTOR_STORE_DIR'))
+            self.rerank_vectors = np.memmap(self._rerank_file, dtype='float32', mode='w+', shape=embeddings.shape)
+            self.rerank_vectors[:] = embeddings
+            self.rerank_vectors.flush()
+
+    @classmethod
+    def empty(cls, dimension: int) -> "KnowledgeBaseStore":
+        return cls([], np.zeros((0, dimension), dtype='float32'), dimension)
+
+    def __len__(self) -> int:
+        return self.index.ntotal
+
+    def search(self, query_embedding: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        if self.index.ntotal == 0:
+            return []
+        query_embedding = np.ascontiguousarray(query_embedding, dtype='float32').reshape(1, -1)
+
+        if self.rerank_vectors is None:
+            scores, indices = self.index.search(query_embedding, top_k)
+            return [(int(idx), float(score)) for score, idx in zip(scores[0], indices[0]) if idx >= 0]
+
+        # Over-fetch approximate candidates, then re-score them exactly
+        _, indices = self.index.search(query_embedding, top_k * self.rerank_factor)
+        candidates = np.unique(indices[0][indices[0] >= 0])
+        exact_scores = self.rerank_vectors[candidates] @ query_embedding[0]
+        order = np.argsort(-exact_scores)[:top_k]
+        return [(int(candidates[i]), float(exact_scores[i])) for i in order]
+
+    def memory_usage(self) -> Dict[str, Any]:
+        index_bytes = getattr(self.index, 'code_size', self.index.d * 4) * self.index.ntotal
+        if isinstance(self.index, faiss.IndexPQ):
+            index_bytes += faiss.vector_to_array(self.index.pq.centroids).nbytes
+        metadata_bytes = self.ids.nbytes + self.titles.nbytes + self.snippets.nbytes
+        return {
+            "index_type": self.index_type if not isinstance(self.index, faiss.IndexFlat) else "flat",
+            "total_items": self.index.ntotal,
+            "dimension": self.index.d,
+            "index_bytes": int(index_bytes),
+            "float32_equivalent_bytes": self.index.d * 4 * self.index.ntotal,
+            "metadata_bytes": int(metadata_bytes),
+            "rerank_vectors_on_disk_bytes": int(self.rerank_vectors.nbytes) if self.rerank_vectors is not None else 0,
+        }
+
+def process_rss_bytes() -> int:
+    """Resident set size of this worker, or 0 where /proc is unavailable."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        logging.warning("Could not read process RSS")
+        return 0
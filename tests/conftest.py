@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# backend/ is run as a flat set of modules (uvicorn server:app), so import it the same way
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
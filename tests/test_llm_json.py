@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+
+from llm_json import (
+    match_items_by_index, parse_bulk_items, parse_json_array_partial, run_bulk_with_followup, strip_code_fences
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n["Positive"]\n```', '["Positive"]'),
+    ('```["Positive"]```', '["Positive"]'),
+    ('["Positive"]', '["Positive"]'),
+])
+def test_strip_code_fences(text, expected):
+    assert strip_code_fences(text) == expected
+
+
+def test_valid_array_is_complete():
+    assert parse_json_array_partial('["Positive", "Neutral"]', 2) == (["Positive", "Neutral"], True)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('["Positive", "Neutral"', ["Positive", "Neutral", None]),
+    ('[{"a":1}, {"b":2}', [{"a": 1}, {"b": 2}, None]),
+    ('[{"a":1}, {"b":2}, {"c":"tru', [{"a": 1}, {"b": 2}, None]),
+    ('["Positive", ', ["Positive", None, None]),
+])
+def test_truncation_keeps_complete_elements(text, expected):
+    assert parse_json_array_partial(text, 3) == (expected, False)
+
+
+def test_malformed_middle_element_keeps_later_indexes():
+    items, complete = parse_json_array_partial('[{"a":1}, {"a":2,,}, {"a":"x]"}]', 3)
+    assert items == [{"a": 1}, None, {"a": "x]"}]
+    assert not complete
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('[{"a":1} {"b":2}]', [{"a": 1}, None]),
+    ('["Positive", "Neutral"", "Negative"]', ["Positive", "Neutral", None]),
+    ('["Positive", "Neutral" x, "Negative"]', ["Positive", "Neutral", None]),
+])
+def test_ambiguous_token_after_element_stops_parsing(text, expected):
+    # Later slots stay missing (and get re-queued) rather than being shifted onto other emails
+    assert parse_json_array_partial(text, len(expected)) == (expected, False)
+
+
+def test_stray_closing_brace_is_skipped():
+    items, complete = parse_json_array_partial('[{"a":1}}, {"b":2}, {"c":3}]', 3)
+    assert items == [{"a": 1}, {"b": 2}, {"c": 3}]
+    assert not complete
+    assert parse_json_array_partial('[{"a":1}, {"b":2}}}, {"c":3}', 3)[0] == [{"a": 1}, {"b": 2}, {"c": 3}]
+
+
+def test_wrapped_object_is_unwrapped():
+    assert parse_json_array_partial('{"results": ["Positive", "Negative"]}', 2) == (["Positive", "Negative"], True)
+    assert parse_json_array_partial('{"results": ["Positive", "Negative"', 2) == (["Positive", "Negative"], False)
+
+
+def test_single_object_is_not_unwrapped():
+    obj = {"phone": None, "order_id": "1", "urgency_keywords": ["urgent", "asap"]}
+    text = '{"phone": null, "order_id": "1", "urgency_keywords": ["urgent", "asap"]}'
+    assert parse_json_array_partial(text, 1) == ([obj], True)
+    assert parse_json_array_partial(text[:-1], 1) == ([None], False)
+    assert parse_json_array_partial(text, 2) == ([None, None], False)
+
+
+def test_over_and_under_length_are_fitted_to_expected():
+    assert parse_json_array_partial('[1, 2, 3, 4]', 3) == ([1, 2, 3], True)
+    assert parse_json_array_partial('[1]', 3) == ([1, None, None], True)
+
+
+def test_no_array_returns_all_missing():
+    assert parse_json_array_partial("I cannot help with that.", 2) == ([None, None], False)
+
+
+def test_parse_bulk_items_validates_each_slot():
+    def validate(value):
+        if value not in ("Positive", "Neutral", "Negative"):
+            raise ValueError(value)
+        return value
+
+    text = '```json\n["Positive", "Angry", {"x": 1}, "Negative"'
+    assert parse_bulk_items("sentiment", "initial", text, 5, validate) == ["Positive", None, None, "Negative", None]
+
+
+def test_items_are_matched_by_index():
+    items = [{"index": 2, "v": "b"}, {"index": 1, "v": "a"}, None]
+    assert match_items_by_index(items, 3) == [{"index": 1, "v": "a"}, {"index": 2, "v": "b"}, None]
+    # Without a usable index on every object, positions are kept as-is
+    assert match_items_by_index([{"v": "a"}, {"index": 1}], 2) == [{"v": "a"}, {"index": 1}]
+    assert match_items_by_index([{"index": 5}], 2) == [{"index": 5}]
+
+
+def test_parse_bulk_items_reslots_out_of_order_objects():
+    text = '[{"index": 2, "order_id": "B"}, {"index": 1, "order_id": "A"}, {"index": 3, "order_id": "C"'
+    results = parse_bulk_items("extract", "initial", text, 3, lambda item: item["order_id"])
+    assert results == ["A", "B", None]
+
+
+def run_with_followup(responses, emails):
+    """Drive run_bulk_with_followup with a fake batch runner returning canned slot lists."""
+    calls = []
+
+    async def run_batch(batch, attempt):
+        calls.append((list(batch), attempt))
+        return responses.pop(0)(batch)
+
+    results = asyncio.run(run_bulk_with_followup("test", emails, run_batch, lambda: "default"))
+    return results, calls
+
+
+def test_followup_requeues_only_missing_items():
+    emails = ["e1", "e2", "e3", "e4"]
+    responses = [
+        lambda batch: ["r1", None, "r3", None],
+        lambda batch: [f"retried-{e}" for e in batch],
+    ]
+    results, calls = run_with_followup(responses, emails)
+    assert results == ["r1", "retried-e2", "r3", "retried-e4"]
+    assert calls == [(emails, "initial"), (["e2", "e4"], "followup")]
+
+
+def test_items_still_missing_after_followup_use_fallback():
+    responses = [
+        lambda batch: ["r1", None, None],
+        lambda batch: ["retried", None],
+    ]
+    results, calls = run_with_followup(responses, ["e1", "e2", "e3"])
+    assert results == ["r1", "retried", "default"]
+    assert len(calls) == 2
+
+
+def test_failed_call_is_not_resent():
+    results, calls = run_with_followup([lambda batch: None], ["e1", "e2"])
+    assert results == ["default", "default"]
+    assert calls == [(["e1", "e2"], "initial")]
+
+
+def test_unusable_response_is_requeued():
+    # A response that parsed but yielded nothing valid (e.g. one email, bad label) still gets a follow-up
+    responses = [
+        lambda batch: [None],
+        lambda batch: ["Neutral"],
+    ]
+    results, calls = run_with_followup(responses, ["e1"])
+    assert results == ["Neutral"]
+    assert calls == [(["e1"], "initial"), (["e1"], "followup")]
+
+
+def test_failed_followup_keeps_recovered_items():
+    responses = [
+        lambda batch: ["r1", None],
+        lambda batch: None,
+    ]
+    results, calls = run_with_followup(responses, ["e1", "e2"])
+    assert results == ["r1", "default"]
+    assert len(calls) == 2
+
+
+def test_complete_response_makes_single_call():
+    results, calls = run_with_followup([lambda batch: ["a", "b"]], ["e1", "e2"])
+    assert results == ["a", "b"]
+    assert len(calls) == 1
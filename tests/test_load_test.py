@@ -0,0 +1,39 @@
+import asyncio
+
+import pytest
+
+from benchmarks import load_test
+
+
+@pytest.fixture(scope="module")
+def server():
+    return load_test.load_server()
+
+
+@pytest.mark.parametrize("extra_args", [
+    [],
+    ["--llm-error-rate", "0.3", "--llm-truncate-rate", "0.5"],
+])
+def test_run_scale_smoke(server, extra_args):
+    args = load_test.build_parser().parse_args(["--requests", "10", "--concurrency", "4", *extra_args])
+    report = asyncio.run(load_test.run_scale(server, "tiny", args))
+
+    assert set(report["endpoints"]) == {
+        "POST /api/emails/ingest/mock",
+        "POST /api/emails/{id}/generate",
+        "GET /api/emails",
+        "GET /api/analytics",
+    }
+    for endpoint, stats in report["endpoints"].items():
+        assert stats["errors"] == 0, endpoint
+        assert stats["requests"] > 0, endpoint
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert report["llm_calls"] > 0
+
+
+def test_fake_llm_is_reproducible(server):
+    args = load_test.build_parser().parse_args(
+        ["--requests", "10", "--llm-error-rate", "0.3", "--llm-truncate-rate", "0.5"]
+    )
+    calls = [asyncio.run(load_test.run_scale(server, "tiny", args))["llm_calls"] for _ in range(2)]
+    assert calls[0] == calls[1]
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from vector_store import KnowledgeBaseStore, StringColumn, load_index_config, make_snippet
+
+DIMENSION = 384
+
+
+def normalize(vectors):
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype('float32')
+
+
+def make_corpus(n, seed=0):
+    rng = np.random.default_rng(seed)
+    embeddings = normalize(rng.standard_normal((n, DIMENSION)))
+    queries = normalize(embeddings[:20] + 0.3 * normalize(rng.standard_normal((20, DIMENSION))))
+    docs = [{"id": f"doc_{i}", "title": f"Title {i}", "content": f"Content {i}"} for i in range(n)]
+    return docs, embeddings, queries
+
+
+def test_string_column_round_trips_unicode():
+    values = ["faq_01", "", "Café — naïve ✓", "x" * 500]
+    column = StringColumn(values)
+    assert len(column) == len(values)
+    assert [column[i] for i in range(len(values))] == values
+    assert column.nbytes == sum(len(v.encode('utf-8')) for v in values) + (len(values) + 1) * 8
+
+
+def test_make_snippet():
+    assert make_snippet("short") == "short"
+    assert make_snippet("a" * 200) == "a" * 150 + "..."
+
+
+# 300 items trains full 8-bit PQ codebooks; 20 items shrinks them to 4 bits
+@pytest.mark.parametrize("n", [300, 20])
+@pytest.mark.parametrize("index_type", ["flat", "sq8", "pq"])
+def test_search_matches_exact_top_k(index_type, n):
+    docs, embeddings, queries = make_corpus(n)
+    store = KnowledgeBaseStore(docs, embeddings, DIMENSION, index_type=index_type)
+    exact_scores = queries @ embeddings.T
+    for query, scores in zip(queries, exact_scores):
+        hits = store.search(query, 3)
+        assert [idx for idx, _ in hits] == list(np.argsort(-scores)[:3])
+        # Compressed indexes are re-ranked against the exact vectors
+        assert [score for _, score in hits] == pytest.approx(list(np.sort(scores)[::-1][:3]), abs=1e-5)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8", "pq"])
+def test_empty_store(index_type):
+    store = KnowledgeBaseStore([], np.zeros((0, DIMENSION), dtype='float32'), DIMENSION, index_type=index_type)
+    assert len(store) == 0
+    assert store.search(np.ones(DIMENSION, dtype='float32'), 3) == []
+    assert store.memory_usage()["index_bytes"] == 0
+
+
+@pytest.mark.parametrize("index_type", ["flat", "sq8", "pq"])
+def test_single_item_store(index_type):
+    docs, embeddings, _ = make_corpus(1)
+    store = KnowledgeBaseStore(docs, embeddings, DIMENSION, index_type=index_type)
+    hits = store.search(embeddings[0], 3)
+    assert [idx for idx, _ in hits] == [0]
+    assert hits[0][1] == pytest.approx(1.0, abs=1e-5)
+    assert store.ids[0] == "doc_0"
+
+
+def test_memory_usage_reports_compression():
+    docs, embeddings, _ = make_corpus(300)
+    float32_bytes = 300 * DIMENSION * 4
+
+    flat = KnowledgeBaseStore(docs, embeddings, DIMENSION, index_type="flat").memory_usage()
+    assert flat["index_bytes"] == float32_bytes
+    assert flat["rerank_vectors_on_disk_bytes"] == 0
+
+    sq8 = KnowledgeBaseStore(docs, embeddings, DIMENSION, index_type="sq8").memory_usage()
+    assert sq8["index_type"] == "sq8"
+    assert sq8["index_bytes"] == float32_bytes // 4
+    assert sq8["rerank_vectors_on_disk_bytes"] == float32_bytes
+
+    pq = KnowledgeBaseStore(docs, embeddings, DIMENSION, index_type="pq", pq_m=48).memory_usage()
+    codebook_bytes = 256 * DIMENSION * 4
+    assert pq["index_bytes"] == 300 * 48 + codebook_bytes
+
+
+def test_load_index_config(monkeypatch):
+    monkeypatch.setenv('VECTOR_INDEX', 'SQ8')
+    assert load_index_config(DIMENSION) == {"index_type": "sq8", "pq_m": 48, "rerank_factor": 4}
+
+    monkeypatch.setenv('VECTOR_INDEX', 'bogus')
+    with pytest.raises(ValueError, match="VECTOR_INDEX"):
+        load_index_config(DIMENSION)
+
+    monkeypatch.setenv('VECTOR_INDEX', 'pq')
+    monkeypatch.setenv('VECTOR_PQ_M', '50')
+    with pytest.raises(ValueError, match="VECTOR_PQ_M"):
+        load_index_config(DIMENSION)
+
+    monkeypatch.setenv('VECTOR_PQ_M', '48')
+    monkeypatch.setenv('VECTOR_RERANK_FACTOR', '0')
+    with pytest.raises(ValueError, match="VECTOR_RERANK_FACTOR"):
+        load_index_config(DIMENSION)